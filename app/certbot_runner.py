@@ -1,11 +1,15 @@
 """Certbot ile sertifika üretimi."""
 import asyncio
+import functools
 import logging
 import os
 import re
 import shutil
+import subprocess
 import tempfile
+import time
 import uuid
+from collections import OrderedDict
 from pathlib import Path
 from typing import NamedTuple
 
@@ -13,9 +17,83 @@ from app.config import CERTBOT_LIVE, CERTBOT_USER_DIR, CERTBOT_USER_WORK, CERTBO
 
 logger = logging.getLogger(__name__)
 
+
+class _PendingJobs(OrderedDict):
+    """
+    job_id -> iş sözlüğü; boyutu ve yaşı sınırlı.
+    Ekleme ve her okumada (in, [], get) sınırı aşan ya da süresi dolan en eski işler atılır:
+    süresi dolmuş iş yok sayılır, süreci öldürülür ve geçici dizini silinir. Açıkça pop edilen işlere dokunulmaz.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 3600.0):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._born: dict[str, float] = {}
+
+    def __setitem__(self, key: str, value: dict) -> None:
+        super().__setitem__(key, value)
+        self._born[key] = time.monotonic()
+        self._evict()
+
+    def __getitem__(self, key: str) -> dict:
+        self._evict()
+        return super().__getitem__(key)
+
+    def __contains__(self, key: object) -> bool:
+        self._evict()
+        return super().__contains__(key)
+
+    def get(self, key: str, default=None):
+        self._evict()
+        return super().get(key, default)
+
+    def __delitem__(self, key: str) -> None:
+        super().__delitem__(key)
+        self._born.pop(key, None)
+
+    def pop(self, key: str, *default):
+        self._born.pop(key, None)
+        return super().pop(key, *default)
+
+    def popitem(self, last: bool = True) -> tuple[str, dict]:
+        key, value = super().popitem(last)
+        self._born.pop(key, None)
+        return key, value
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self:
+            oldest = next(iter(self))
+            if len(self) <= self.maxsize and now - self._born.get(oldest, now) <= self.ttl:
+                break
+            entry = self.pop(oldest)
+            _discard_job(entry)
+            logger.info("Süresi dolan certbot işi atıldı: %s", oldest)
+
+
 # Manuel doğrulama bekleyen işler: job_id -> { status, proc, temp_dir, domain_id, ... }
-_pending_dns: dict[str, dict] = {}
-_pending_http: dict[str, dict] = {}
+_pending_dns: dict[str, dict] = _PendingJobs()
+_pending_http: dict[str, dict] = _PendingJobs()
+
+# certbot yolu bir kez çözülür; PATH taraması her işlemde tekrarlanmaz
+_CERTBOT_BIN: str | None = shutil.which("certbot")
+
+# Sertifikası olmayan domainler için kısa süreli negatif önbellek: sanitized -> (zaman, sonuç)
+_CERT_MISS_TTL_SECONDS = 30.0
+_cert_miss_cache: dict[str, tuple[float, "CertbotResult"]] = {}
+
+# Root olmadan çalışsın: config/work/logs kullanıcı dizinine yazılır
+_CERTBOT_DIR_ARGS = (
+    "--config-dir",
+    str(CERTBOT_USER_DIR),
+    "--work-dir",
+    str(CERTBOT_USER_WORK),
+    "--logs-dir",
+    str(CERTBOT_USER_LOGS),
+)
+
+_DOMAIN_RE = re.compile(r"[^a-z0-9.-]")
 
 _PEM_BLOCK_RE = re.compile(
     rb"-----BEGIN CERTIFICATE-----.*?-----END CERTIFICATE-----",
@@ -32,12 +110,150 @@ class CertbotResult(NamedTuple):
     error: str | None
 
 
+# Sık dönen hata sonuçları: NamedTuple değişmez olduğu için her seferinde yeniden kurulmaz
+_ERR_NO_CERTBOT = CertbotResult(False, None, None, None, None, "certbot bulunamadı. Kurulum: apt install certbot")
+_ERR_INVALID_DOMAIN = CertbotResult(False, None, None, None, None, "Geçersiz domain")
+_ERR_NO_DIR = CertbotResult(False, None, None, None, None, "Sertifika dizini bulunamadı")
+_ERR_NO_CERT = CertbotResult(False, None, None, None, None, "Sertifika dosyası oluşturulmadı")
+_ERR_INVALID_JOB = CertbotResult(False, None, None, None, None, "Geçersiz veya süresi dolmuş iş")
+
+
+def _get_certbot() -> str | None:
+    """Önbellekteki certbot yolunu döndürür; bulunamamışsa PATH'i yeniden tarar."""
+    global _CERTBOT_BIN
+    if not _CERTBOT_BIN:
+        _CERTBOT_BIN = shutil.which("certbot")
+    return _CERTBOT_BIN
+
+
+def invalidate_certbot_cache() -> None:
+    """certbot yolunu unutur (örn. kurulum/PATH değişince)."""
+    global _CERTBOT_BIN
+    _CERTBOT_BIN = None
+
+
+class _HookSignal:
+    """
+    Auth hook'un FIFO'ya yazdığı sinyali event loop üzerinden bekler.
+    Dosya var mı diye periyodik sorgulamak yerine hook yazdığında uyanılır.
+    """
+
+    def __init__(self, temp_dir: Path):
+        self.path = temp_dir / "ready.fifo"
+        os.mkfifo(self.path, 0o600)
+        self._rfd = os.open(self.path, os.O_RDONLY | os.O_NONBLOCK)
+        # Yazıcı ucu da açık tutulur: hook kapattığında sürekli EOF (POLLHUP) tetiklenmez,
+        # hook'un FIFO'yu açması da okuyucu hazır olduğu için bloklanmaz.
+        self._wfd = os.open(self.path, os.O_WRONLY | os.O_NONBLOCK)
+
+    def _drain(self) -> bool:
+        """Bekleyen sinyalleri okur; en az bir sinyal varsa True döner."""
+        got = False
+        while True:
+            try:
+                chunk = os.read(self._rfd, 4096)
+            except BlockingIOError:
+                return got
+            if not chunk:
+                return got
+            got = True
+
+    async def wait(self, timeout: float, other: asyncio.Future | None = None) -> bool:
+        """
+        Sinyal gelene, `other` bitene ya da süre dolana dek bekler.
+        Sinyal geldiyse True, aksi halde False döner.
+        """
+        if self._drain():
+            return True
+        loop = asyncio.get_running_loop()
+        event = asyncio.Event()
+        loop.add_reader(self._rfd, event.set)
+        waiter = asyncio.ensure_future(event.wait())
+        try:
+            waitables = {waiter} if other is None else {waiter, other}
+            await asyncio.wait(waitables, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            loop.remove_reader(self._rfd)
+            waiter.cancel()
+        return self._drain()
+
+    def close(self) -> None:
+        for fd in (self._rfd, self._wfd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+async def _spawn_certbot(
+    cmd: list[str],
+    env: dict | None = None,
+    stdout: int = subprocess.PIPE,
+) -> asyncio.subprocess.Process:
+    """
+    certbot'u asyncio alt süreci olarak başlatır. wait/communicate event loop üzerinde beklenir:
+    kullanıcıyı bekleyen manuel işler (1 saate kadar) varsayılan thread havuzunu meşgul etmez.
+    """
+    return await asyncio.create_subprocess_exec(*cmd, stdout=stdout, stderr=subprocess.PIPE, env=env)
+
+
+# Auth hook betikleri sabittir; iş dizini ortam değişkeniyle verilir.
+# HTTP-01 hook'u her domain için ayrı çalışır: token'a özel dosyalara yazar,
+# kendi done_<token> dosyası oluşana dek bekler.
+# Hook yolu renewal conf'a yazıldığından uygulama dışı `certbot renew` da çalıştırır;
+# değişken yoksa kökte beklemek yerine hemen hata verilir.
+_HOOKS_DIR = CERTBOT_USER_DIR / "hooks"
+_HTTP_HOOK = (
+    "#!/bin/bash\n"
+    ': "${CERTBOT_HTTP_WAIT_DIR:?}"\n'
+    'dir="$CERTBOT_HTTP_WAIT_DIR"\n'
+    'echo "$CERTBOT_DOMAIN" > "$dir/domain_$CERTBOT_TOKEN"\n'
+    'echo "$CERTBOT_VALIDATION" > "$dir/validation_$CERTBOT_TOKEN"\n'
+    'echo x > "$dir/ready.fifo"\n'
+    'while [ ! -f "$dir/done_$CERTBOT_TOKEN" ]; do sleep 1; done\n'
+    "exit 0\n"
+)
+_DNS_HOOK = (
+    "#!/bin/bash\n"
+    ': "${CERTBOT_DNS_WAIT_DIR:?}"\n'
+    'dir="$CERTBOT_DNS_WAIT_DIR"\n'
+    'echo "$CERTBOT_VALIDATION" > "$dir/validation.txt"\n'
+    'echo "$CERTBOT_DOMAIN" > "$dir/domain.txt"\n'
+    'echo x > "$dir/ready.fifo"\n'
+    'while [ ! -f "$dir/done" ]; do sleep 1; done\n'
+    "exit 0\n"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _hook_script(name: str, body: str) -> Path:
+    """Hook betiğini ortak dizine bir kez yazar (içerik farklıysa günceller) ve yolunu döndürür."""
+    path = _HOOKS_DIR / name
+    try:
+        current = path.read_text(encoding="utf-8")
+    except OSError:
+        current = None
+    if current != body:
+        _HOOKS_DIR.mkdir(parents=True, exist_ok=True)
+        path.write_text(body, encoding="utf-8")
+        path.chmod(0o755)
+    return path
+
+
+def _close_hook_signal(entry: dict) -> None:
+    """İşin FIFO tanımlayıcılarını kapatır."""
+    signal = entry.pop("signal", None)
+    if signal:
+        signal.close()
+
+
+@functools.lru_cache(maxsize=1024)
 def _sanitize_domain(domain: str) -> str:
     """Certbot dizin adı için güvenli isim (örn. *.example.com -> example.com)."""
     domain = domain.strip().lower()
     if domain.startswith("*."):
         domain = domain[2:]
-    return re.sub(r"[^a-z0-9.-]", "", domain)
+    return _DOMAIN_RE.sub("", domain)
 
 
 # İki parçalı kamu sonekleri: apex tespiti için (imhotep.com.tr -> apex)
@@ -84,13 +300,13 @@ async def run_certbot(
     Certbot ile sertifika alır.
     Linux'ta certbot kurulu ve root/sudo ile çalıştırılabilir olmalı.
     """
-    certbot = shutil.which("certbot")
+    certbot = _get_certbot()
     if not certbot:
-        return CertbotResult(False, None, None, None, None, "certbot bulunamadı. Kurulum: apt install certbot")
+        return _ERR_NO_CERTBOT
 
     sanitized = _sanitize_domain(domain)
     if not sanitized:
-        return CertbotResult(False, None, None, None, None, "Geçersiz domain")
+        return _ERR_INVALID_DOMAIN
 
     cmd = [
         certbot,
@@ -107,15 +323,7 @@ async def run_certbot(
     ]
     for name in expand_domains(domain):
         cmd.extend(["-d", name])
-    cmd.extend([
-        # Root olmadan çalışsın: config/work/logs kullanıcı dizinine yazılır
-        "--config-dir",
-        str(CERTBOT_USER_DIR),
-        "--work-dir",
-        str(CERTBOT_USER_WORK),
-        "--logs-dir",
-        str(CERTBOT_USER_LOGS),
-    ])
+    cmd.extend(_CERTBOT_DIR_ARGS)
     if dry_run:
         cmd.append("--dry-run")
     if webroot:
@@ -126,14 +334,12 @@ async def run_certbot(
         cmd.append("--standalone")
 
     try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-        )
-        stdout, stderr = await proc.communicate()
+        # stdout kullanılmıyor; yalnızca hata mesajı için stderr toplanır.
+        # stderr süreç bitmeden de okunmalı: dolan boru certbot'u kilitler.
+        proc = await _spawn_certbot(cmd, stdout=subprocess.DEVNULL)
+        _, stderr = await proc.communicate()
         if proc.returncode != 0:
-            err = (stderr or stdout or b"").decode("utf-8", errors="replace").strip()
+            err = (stderr or b"").decode("utf-8", errors="replace").strip()
             return CertbotResult(False, None, None, None, None, err or f"Çıkış kodu: {proc.returncode}")
 
         # Sertifikalar kullanıcı dizinine yazıldı
@@ -144,8 +350,9 @@ async def run_certbot(
         fullchain_path = live_dir / "fullchain.pem"
 
         if not cert_path.exists():
-            return CertbotResult(False, None, None, None, None, "Sertifika dosyası oluşturulmadı")
+            return _ERR_NO_CERT
 
+        invalidate_cert_cache(sanitized)
         return CertbotResult(
             success=True,
             cert_path=str(cert_path),
@@ -166,9 +373,20 @@ def _path_exists(path: Path) -> bool:
         return False
 
 
-def get_cert_paths(domain: str) -> CertbotResult:
-    """Mevcut certbot sertifika dizinlerini döndürür. Önce kullanıcı dizinine, yoksa sisteme bakar."""
-    sanitized = _sanitize_domain(domain)
+def _dir_mtime_ns(path: Path) -> int:
+    """Dizin mtime'ı (ns); dizin yoksa veya okunamıyorsa -1."""
+    try:
+        return path.stat().st_mtime_ns
+    except OSError:
+        return -1
+
+
+@functools.lru_cache(maxsize=512)
+def _resolve_cert_paths(sanitized: str, user_mtime_ns: int, system_mtime_ns: int) -> CertbotResult:
+    """
+    get_cert_paths'in asıl işi. Live dizinlerinin mtime'ı anahtarın parçasıdır:
+    certbot sembolik linkleri yenileyince mtime değişir ve önbellek kendiliğinden geçersizleşir.
+    """
     # Önce kullanıcı dizini (web'den üretilen), sonra sistem /etc/letsencrypt
     for base in (CERTBOT_USER_DIR / "live", Path(CERTBOT_LIVE)):
         live_dir = base / sanitized
@@ -182,7 +400,38 @@ def get_cert_paths(domain: str) -> CertbotResult:
                 fullchain_path=str(live_dir / "fullchain.pem") if _path_exists(live_dir / "fullchain.pem") else None,
                 error=None,
             )
-    return CertbotResult(False, None, None, None, None, "Sertifika dizini bulunamadı")
+    return _ERR_NO_DIR
+
+
+def get_cert_paths(domain: str) -> CertbotResult:
+    """Mevcut certbot sertifika dizinlerini döndürür. Önce kullanıcı dizinine, yoksa sisteme bakar."""
+    sanitized = _sanitize_domain(domain)
+    miss = _cert_miss_cache.get(sanitized)
+    if miss and time.monotonic() - miss[0] < _CERT_MISS_TTL_SECONDS:
+        return miss[1]
+    result = _resolve_cert_paths(
+        sanitized,
+        _dir_mtime_ns(CERTBOT_USER_DIR / "live" / sanitized),
+        _dir_mtime_ns(Path(CERTBOT_LIVE) / sanitized),
+    )
+    if result.success:
+        _cert_miss_cache.pop(sanitized, None)
+    else:
+        _cert_miss_cache[sanitized] = (time.monotonic(), result)
+    return result
+
+
+def invalidate_cert_cache(domain: str | None = None) -> None:
+    """
+    Sertifika yolu önbelleğini temizler (sertifika üretildikten sonra çağrılır).
+    lru_cache tek anahtar silemediği için yol önbelleğinin tamamı boşaltılır;
+    negatif önbellekten yalnızca verilen domain (yoksa hepsi) silinir.
+    """
+    _resolve_cert_paths.cache_clear()
+    if domain is None:
+        _cert_miss_cache.clear()
+    else:
+        _cert_miss_cache.pop(_sanitize_domain(domain), None)
 
 
 async def run_certbot_http_manual(domain: str, email: str, domain_id: int) -> tuple[str | None, str | None, str | None, str | None]:
@@ -204,31 +453,36 @@ async def run_certbot_http_manual(domain: str, email: str, domain_id: int) -> tu
     return None, None, None, "Doğrulama dosyası zaman aşımı (90 sn)"
 
 
+def _read_dns_challenge(temp_dir: Path, sanitized: str) -> tuple[str, str] | None:
+    """DNS hook'unun yazdığı (TXT adı, TXT değeri) çiftini okur; henüz yoksa None."""
+    names = set(os.listdir(temp_dir))
+    if "validation.txt" not in names:
+        return None
+    txt_value = (temp_dir / "validation.txt").read_text(encoding="utf-8").strip()
+    domain_file = temp_dir / "domain.txt"
+    txt_name = f"_acme-challenge.{domain_file.read_text(encoding='utf-8').strip()}" if "domain.txt" in names else f"_acme-challenge.{sanitized}"
+    return txt_name, txt_value
+
+
 async def run_certbot_dns_manual(domain: str, email: str, domain_id: int) -> tuple[str | None, str | None, str | None, str | None]:
     """
     DNS-01 (manuel) ile sertifika başlatır. Domain başka sunucuda olduğunda kullanılır.
     Döner: (job_id, txt_name, txt_value, error). Hata varsa job_id None, error dolu.
     """
-    certbot = shutil.which("certbot")
+    certbot = _get_certbot()
     if not certbot:
         return None, None, None, "certbot bulunamadı. Kurulum: apt install certbot"
     sanitized = _sanitize_domain(domain)
     if not sanitized:
         return None, None, None, "Geçersiz domain"
 
-    temp_dir = Path(tempfile.mkdtemp(prefix="certbot_dns_"))
-    hook_script = temp_dir / "auth_hook.sh"
-    hook_script.write_text(
-        "#!/bin/bash\n"
-        f'echo "$CERTBOT_VALIDATION" > "{temp_dir}/validation.txt"\n'
-        f'echo "$CERTBOT_DOMAIN" > "{temp_dir}/domain.txt"\n'
-        f'while [ ! -f "{temp_dir}/done" ]; do sleep 1; done\n'
-        "exit 0\n",
-        encoding="utf-8",
-    )
-    hook_script.chmod(0o755)
+    # Disk işlemleri thread'de: event loop dosya sistemini beklemez
+    hook_script = await asyncio.to_thread(_hook_script, "dns_auth_hook.sh", _DNS_HOOK)
+    temp_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="certbot_dns_"))
+    signal = _HookSignal(temp_dir)
 
-    env = {**os.environ, "CERTBOT_DNS_WAIT_DIR": str(temp_dir)}
+    env = os.environ.copy()
+    env["CERTBOT_DNS_WAIT_DIR"] = str(temp_dir)
     cmd = [
         certbot,
         "certonly",
@@ -240,29 +494,16 @@ async def run_certbot_dns_manual(domain: str, email: str, domain_id: int) -> tup
         email,
         "-d",
         sanitized,
-        "--config-dir",
-        str(CERTBOT_USER_DIR),
-        "--work-dir",
-        str(CERTBOT_USER_WORK),
-        "--logs-dir",
-        str(CERTBOT_USER_LOGS),
+        *_CERTBOT_DIR_ARGS,
         "--manual-auth-hook",
         str(hook_script),
     ]
     try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env=env,
-        )
-        for _ in range(120):
-            await asyncio.sleep(0.5)
-            val_file = temp_dir / "validation.txt"
-            if val_file.exists():
-                txt_value = val_file.read_text(encoding="utf-8").strip()
-                domain_file = temp_dir / "domain.txt"
-                txt_name = f"_acme-challenge.{domain_file.read_text(encoding='utf-8').strip()}" if domain_file.exists() else f"_acme-challenge.{sanitized}"
+        proc = await _spawn_certbot(cmd, env)
+        if await signal.wait(60.0):
+            challenge = await asyncio.to_thread(_read_dns_challenge, temp_dir, sanitized)
+            if challenge:
+                txt_name, txt_value = challenge
                 job_id = str(uuid.uuid4())
                 _pending_dns[job_id] = {
                     "proc": proc,
@@ -271,48 +512,70 @@ async def run_certbot_dns_manual(domain: str, email: str, domain_id: int) -> tup
                     "domain": sanitized,
                     "txt_name": txt_name,
                     "txt_value": txt_value,
+                    "signal": signal,
                 }
                 return job_id, txt_name, txt_value, None
         proc.kill()
         await proc.wait()
+        signal.close()
         return None, None, None, "TXT dosyası zaman aşımı (60 sn)"
     except Exception as e:
+        signal.close()
         return None, None, None, str(e)
 
 
-def _register_new_challenges(entry: dict) -> int:
+def _read_new_challenges(temp_dir: str, known: frozenset[str]) -> list[tuple[str, str, str | None]]:
     """
-    temp_dir'de hook'un yazdığı yeni doğrulama dosyalarını challenge listesine ekler.
-    Birden çok domain (örn. apex + www) için certbot hook'u her domain için ayrı çağırır.
+    temp_dir'de hook'un yazdığı, henüz bilinmeyen doğrulama dosyalarını okur (thread'de çalışır, iş sözlüğüne dokunmaz).
+    Döner: (token, içerik, domain) listesi.
     """
-    temp_dir = entry.get("temp_dir")
-    if not temp_dir:
-        return 0
-    known = {c["file_name"] for c in entry.get("challenges", [])}
-    new_count = 0
-    for val_file in sorted(Path(temp_dir).glob("validation_*")):
-        token = val_file.name[len("validation_"):]
+    # Tek dizin okuması: dosya başına ayrı stat çağrısı yapılmaz
+    try:
+        names = set(os.listdir(temp_dir))
+    except OSError:
+        return []
+    found = []
+    for val_name in sorted(n for n in names if n.startswith("validation_")):
+        token = val_name[len("validation_"):]
         if not token or token in known:
             continue
-        domain_file = Path(temp_dir) / f"domain_{token}"
+        domain_name = f"domain_{token}"
         try:
-            challenge_domain = domain_file.read_text(encoding="utf-8").strip() if domain_file.exists() else None
-            file_content = val_file.read_text(encoding="utf-8").strip()
+            challenge_domain = (Path(temp_dir) / domain_name).read_text(encoding="utf-8").strip() if domain_name in names else None
+            file_content = (Path(temp_dir) / val_name).read_text(encoding="utf-8").strip()
         except OSError:
             continue
-        entry.setdefault("challenges", []).append({
+        found.append((token, file_content, challenge_domain))
+    return found
+
+
+async def _register_new_challenges(entry: dict) -> int:
+    """
+    Yeni doğrulama dosyalarını challenge listesine ekler.
+    Birden çok domain (örn. apex + www) için certbot hook'u her domain için ayrı çağırır.
+    Dosyalar thread'de okunur; iş sözlüğü yalnızca event loop'ta, tek adımda güncellenir
+    (durum sorguları yeni challenge'ı eski dosya adıyla birlikte görmez).
+    """
+    temp_dir = entry.get("temp_dir")
+    if not temp_dir:
+        return 0
+    known = frozenset(c["file_name"] for c in entry.get("challenges", []))
+    found = await asyncio.to_thread(_read_new_challenges, temp_dir, known)
+    if not found:
+        return 0
+    challenges = entry.setdefault("challenges", [])
+    for token, file_content, challenge_domain in found:
+        challenges.append({
             "file_name": token,
             "file_content": file_content,
             "domain": challenge_domain or entry.get("domain"),
             "released": False,
         })
-        new_count += 1
-    if new_count:
-        current = entry["challenges"][-1]
-        entry["file_name"] = current["file_name"]
-        entry["file_content"] = current["file_content"]
-        entry["challenge_domain"] = current["domain"]
-    return new_count
+    current = challenges[-1]
+    entry["file_name"] = current["file_name"]
+    entry["file_content"] = current["file_content"]
+    entry["challenge_domain"] = current["domain"]
+    return len(found)
 
 
 async def _finalize_http_job(job_id: str, domain_id: int) -> None:
@@ -332,16 +595,18 @@ async def _finalize_http_job(job_id: str, domain_id: int) -> None:
         err = (stderr or stdout or b"").decode("utf-8", errors="replace").strip()
         result = CertbotResult(False, None, None, None, None, err or f"Çıkış kodu: {proc.returncode}")
     else:
+        invalidate_cert_cache(entry["domain"])
         result = get_cert_paths(entry["domain"])
         if not result.success:
-            result = CertbotResult(False, None, None, None, None, "Sertifika dosyası oluşturulmadı")
+            result = _ERR_NO_CERT
     entry["result"] = result
     entry["success"] = result.success
     entry["error"] = result.error
     entry["status"] = "done" if result.success else "error"
+    _close_hook_signal(entry)
     temp_dir = entry.get("temp_dir")
     if temp_dir:
-        shutil.rmtree(temp_dir, ignore_errors=True)
+        await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
     entry["temp_dir"] = None
     entry["proc"] = None
 
@@ -367,7 +632,7 @@ async def continue_certbot_http(job_id: str, domain_id: int) -> CertbotResult |
     """
     entry = _pending_http.get(job_id)
     if entry is None:
-        return CertbotResult(False, None, None, None, None, "Geçersiz veya süresi dolmuş iş")
+        return _ERR_INVALID_JOB
     proc = entry.get("proc")
     temp_dir = entry.get("temp_dir")
     if not proc or not temp_dir:
@@ -376,13 +641,19 @@ async def continue_certbot_http(job_id: str, domain_id: int) -> CertbotResult |
     # Bekleyen hook'ları serbest bırak: dosya yüklendi, certbot devam edebilir
     for ch in entry.get("challenges", []):
         if not ch["released"]:
-            (Path(temp_dir) / f"done_{ch['file_name']}").write_text("1", encoding="utf-8")
+            await asyncio.to_thread((Path(temp_dir) / f"done_{ch['file_name']}").write_text, "1", encoding="utf-8")
             ch["released"] = True
 
     io_task = entry.get("io_task")
-    for _ in range(600):  # 300 sn
-        await asyncio.sleep(0.5)
-        if _register_new_challenges(entry):
+    signal = entry.get("signal")
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + 300.0
+    while (remaining := deadline - loop.time()) > 0:
+        if signal:
+            await signal.wait(remaining, io_task)
+        else:
+            await asyncio.sleep(0.5)
+        if await _register_new_challenges(entry):
             return None
         if io_task and io_task.done():
             await _finalize_http_job(job_id, domain_id)
@@ -398,7 +669,8 @@ async def continue_certbot_http(job_id: str, domain_id: int) -> CertbotResult |
     entry["success"] = False
     entry["error"] = result.error
     entry["status"] = "error"
-    shutil.rmtree(temp_dir, ignore_errors=True)
+    _close_hook_signal(entry)
+    await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
     entry["temp_dir"] = None
     entry["proc"] = None
     return result
@@ -407,12 +679,12 @@ async def continue_certbot_http(job_id: str, domain_id: int) -> CertbotResult |
 async def continue_certbot_dns(job_id: str) -> CertbotResult:
     """DNS-01 işinde kullanıcı TXT ekledikten sonra certbot'u devam ettirir."""
     if job_id not in _pending_dns:
-        return CertbotResult(False, None, None, None, None, "Geçersiz veya süresi dolmuş iş")
+        return _ERR_INVALID_JOB
     entry = _pending_dns[job_id]
     proc = entry["proc"]
     temp_dir = entry["temp_dir"]
     try:
-        (temp_dir / "done").write_text("1", encoding="utf-8")
+        await asyncio.to_thread((temp_dir / "done").write_text, "1", encoding="utf-8")
         try:
             await asyncio.wait_for(proc.wait(), timeout=120.0)
         except asyncio.TimeoutError:
@@ -426,7 +698,8 @@ async def continue_certbot_dns(job_id: str) -> CertbotResult:
         live_dir = CERTBOT_USER_DIR / "live" / sanitized
         cert_path = live_dir / "cert.pem"
         if not cert_path.exists():
-            return CertbotResult(False, None, None, None, None, "Sertifika dosyası oluşturulmadı")
+            return _ERR_NO_CERT
+        invalidate_cert_cache(sanitized)
         return CertbotResult(
             success=True,
             cert_path=str(cert_path),
@@ -436,8 +709,9 @@ async def continue_certbot_dns(job_id: str) -> CertbotResult:
             error=None,
         )
     finally:
+        _close_hook_signal(entry)
         try:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+            await asyncio.to_thread(shutil.rmtree, temp_dir, ignore_errors=True)
         except Exception:
             pass
         _pending_dns.pop(job_id, None)
@@ -507,6 +781,24 @@ def read_ca_bundle_bytes(domain: str) -> bytes | None:
     return None
 
 
+def _discard_job(entry: dict) -> None:
+    """İşin certbot sürecini öldürür, FIFO'sunu kapatır ve geçici dizinini siler."""
+    proc = entry.get("proc")
+    if proc and proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:
+            pass
+    _close_hook_signal(entry)
+    temp_dir = entry.get("temp_dir")
+    if temp_dir:
+        # Eşlemeden (senkron) çağrılır; silme event loop'u bloklamasın diye beklenmeden thread'e verilir
+        try:
+            asyncio.get_running_loop().run_in_executor(None, shutil.rmtree, temp_dir, True)
+        except RuntimeError:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+
 def cancel_pending_http_for_domain(domain_id: int) -> None:
     """Aynı domain için bekleyen eski HTTP-01 işlerini iptal eder."""
     stale_ids = [
@@ -518,15 +810,7 @@ def cancel_pending_http_for_domain(domain_id: int) -> None:
         entry = _pending_http.pop(job_id, None)
         if not entry:
             continue
-        proc = entry.get("proc")
-        if proc and proc.returncode is None:
-            try:
-                proc.kill()
-            except ProcessLookupError:
-                pass
-        temp_dir = entry.get("temp_dir")
-        if temp_dir:
-            shutil.rmtree(temp_dir, ignore_errors=True)
+        _discard_job(entry)
         logger.info("Eski HTTP-01 işi iptal edildi: %s", job_id)
 
 
@@ -558,7 +842,7 @@ async def _run_certbot_http_manual_task(job_id: str, domain: str, email: str, do
     if not entry:
         return
 
-    certbot = shutil.which("certbot")
+    certbot = _get_certbot()
     if not certbot:
         entry["status"] = "error"
         entry["error"] = "certbot bulunamadı. Kurulum: apt install certbot"
@@ -572,20 +856,10 @@ async def _run_certbot_http_manual_task(job_id: str, domain: str, email: str, do
     domains = expand_domains(domain)
     entry["domains"] = domains
 
-    temp_dir = Path(tempfile.mkdtemp(prefix="certbot_http_"))
-    # Hook her domain için ayrı çalışır: token'a özel dosyalara yazar,
-    # kendi done_<token> dosyası oluşana dek bekler.
-    hook_script = temp_dir / "auth_hook.sh"
-    hook_script.write_text(
-        "#!/bin/bash\n"
-        f'echo "$CERTBOT_DOMAIN" > "{temp_dir}/domain_$CERTBOT_TOKEN"\n'
-        f'echo "$CERTBOT_VALIDATION" > "{temp_dir}/validation_$CERTBOT_TOKEN"\n'
-        f'while [ ! -f "{temp_dir}/done_$CERTBOT_TOKEN" ]; do sleep 1; done\n'
-        "exit 0\n",
-        encoding="utf-8",
-    )
-    hook_script.chmod(0o755)
+    hook_script = await asyncio.to_thread(_hook_script, "http_auth_hook.sh", _HTTP_HOOK)
+    temp_dir = Path(await asyncio.to_thread(tempfile.mkdtemp, prefix="certbot_http_"))
     entry["temp_dir"] = temp_dir
+    entry["signal"] = signal = _HookSignal(temp_dir)
 
     cmd = [
         certbot,
@@ -603,28 +877,19 @@ async def _run_certbot_http_manual_task(job_id: str, domain: str, email: str, do
     ]
     for name in domains:
         cmd.extend(["-d", name])
-    cmd.extend([
-        "--config-dir",
-        str(CERTBOT_USER_DIR),
-        "--work-dir",
-        str(CERTBOT_USER_WORK),
-        "--logs-dir",
-        str(CERTBOT_USER_LOGS),
-        "--manual-auth-hook",
-        str(hook_script),
-    ])
+    cmd.extend(_CERTBOT_DIR_ARGS)
+    cmd.extend(["--manual-auth-hook", str(hook_script)])
     try:
-        proc = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
-            env=os.environ.copy(),
-        )
+        env = os.environ.copy()
+        env["CERTBOT_HTTP_WAIT_DIR"] = str(temp_dir)
+        proc = await _spawn_certbot(cmd, env)
         entry["proc"] = proc
         entry["io_task"] = asyncio.ensure_future(proc.communicate())
-        for _ in range(180):
-            await asyncio.sleep(0.5)
-            if _register_new_challenges(entry):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + 90.0
+        while (remaining := deadline - loop.time()) > 0:
+            await signal.wait(remaining, entry["io_task"])
+            if await _register_new_challenges(entry):
                 entry["status"] = "ready"
                 return
             if entry["io_task"].done():
@@ -638,6 +903,7 @@ async def _run_certbot_http_manual_task(job_id: str, domain: str, email: str, do
             pass
         entry["status"] = "error"
         entry["error"] = "Doğrulama dosyası zaman aşımı (90 sn)"
+        _close_hook_signal(entry)
     except Exception as e:
         entry["status"] = "error"
         entry["error"] = str(e)
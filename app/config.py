@@ -7,6 +7,9 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 load_dotenv(BASE_DIR / ".env")
 DATA_DIR = Path(os.environ.get("WEBTRACKER_DATA", str(BASE_DIR / "data")))
 DB_PATH = DATA_DIR / "webtracker.db"
+# Veritabanı bağlantı havuzu
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "10"))
 # Sertifikalar proje klasöründe (webTracker/certs)
 CERTS_DIR = BASE_DIR / "certs"
 CERTBOT_USER_DIR = Path(os.environ.get("CERTBOT_USER_DIR", str(CERTS_DIR)))
@@ -19,6 +22,11 @@ CERTBOT_LIVE = CERTBOT_DIR / "live"
 CERTBOT_EMAIL = os.environ.get("CERTBOT_EMAIL", "info@harunbulbul.com")
 CERTBOT_WEBROOT = os.environ.get("CERTBOT_WEBROOT", "/var/www/html")
 SSL_CHECK_INTERVAL_MINUTES = int(os.environ.get("SSL_CHECK_INTERVAL", "60"))
+# Toplu SSL kontrolünde aynı anda açılacak en fazla bağlantı ve bağlantı başına zaman aşımı (sn)
+SSL_CHECK_CONCURRENCY = int(os.environ.get("SSL_CHECK_CONCURRENCY", "32"))
+SSL_CHECK_TIMEOUT_SECONDS = float(os.environ.get("SSL_CHECK_TIMEOUT", "10"))
+# Başarılı SSL kontrol sonucunun yeniden kullanılacağı süre (sn); 0 önbelleği kapatır
+SSL_CACHE_TTL_SECONDS = float(os.environ.get("SSL_CACHE_TTL", "600"))
 WARN_DAYS_BEFORE_EXPIRY = int(os.environ.get("WARN_DAYS", "30"))
 CRITICAL_DAYS_BEFORE_EXPIRY = int(os.environ.get("CRITICAL_DAYS", "7"))
 APP_TIMEZONE = os.environ.get("APP_TIMEZONE", "Europe/Istanbul")
@@ -1,22 +1,43 @@
 """Veritabanı CRUD işlemleri."""
+import asyncio
 from datetime import datetime, timezone
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
+from app.config import SSL_CHECK_CONCURRENCY, SSL_CHECK_TIMEOUT_SECONDS
 from app.models import Domain
-from app.schemas import DomainCreate, DomainUpdate
-from app.ssl_checker import SSLInfo, get_ssl_info
+from app.schemas import DomainCreate, DomainResponse, DomainUpdate
+from app.ssl_checker import SSLInfo, get_ssl_info, invalidate_ssl_cache, resolve_host
+
+# Çok sayıda domainde dosya tanımlayıcısı/thread tükenmesin diye eşzamanlı kontrol sınırı
+_ssl_check_semaphore = asyncio.Semaphore(SSL_CHECK_CONCURRENCY)
+
+
+async def _fetch_ssl_info(domain: str, addrs: list[tuple[str, int]] | BaseException | None = None) -> SSLInfo:
+    """get_ssl_info'yu eşzamanlılık sınırı içinde çalıştırır."""
+    async with _ssl_check_semaphore:
+        return await get_ssl_info(domain, timeout=SSL_CHECK_TIMEOUT_SECONDS, addrs=addrs)
 
 
 async def get_domains(db: AsyncSession, include_expired: bool = True):
     """Tüm domainleri getirir."""
     q = select(Domain).order_by(Domain.domain)
-    result = await db.execute(q)
-    domains = result.scalars().all()
     if not include_expired:
-        domains = [d for d in domains if d.days_until_expiry is None or d.days_until_expiry >= 0]
-    return domains
+        q = q.where(or_(Domain.days_until_expiry.is_(None), Domain.days_until_expiry >= 0))
+    result = await db.execute(q)
+    return result.scalars().all()
+
+
+# API yanıtındaki alanlara karşılık gelen kolonlar
+_DOMAIN_RESPONSE_COLUMNS = tuple(getattr(Domain, name) for name in DomainResponse.model_fields)
+
+
+async def list_domains_projected(db: AsyncSession):
+    """API listesi için domainleri ORM nesnesi kurmadan, yalnızca yanıt kolonlarıyla getirir."""
+    result = await db.execute(select(*_DOMAIN_RESPONSE_COLUMNS).order_by(Domain.domain))
+    return result.all()
 
 
 async def get_domain_by_id(db: AsyncSession, domain_id: int) -> Domain | None:
@@ -25,26 +46,33 @@ async def get_domain_by_id(db: AsyncSession, domain_id: int) -> Domain | None:
     return result.scalar_one_or_none()
 
 
-async def get_domain_by_name(db: AsyncSession, domain: str) -> Domain | None:
-    """Domain adı ile getirir."""
-    result = await db.execute(select(Domain).where(Domain.domain == domain.strip().lower()))
-    return result.scalar_one_or_none()
+async def get_domain_name(conn: AsyncConnection, domain_id: int) -> str | None:
+    """ID ile yalnızca domain adını getirir (ORM nesnesi kurulmaz)."""
+    return await conn.scalar(select(Domain.domain).where(Domain.id == domain_id))
 
 
-async def create_domain(db: AsyncSession, data: DomainCreate) -> Domain:
-    """Yeni domain ekler ve ilk SSL kontrolünü yapar."""
-    domain = Domain(domain=data.domain.strip().lower(), notes=data.notes)
-    db.add(domain)
-    await db.flush()
-    info = get_ssl_info(domain.domain)
+async def create_domain(db: AsyncSession, data: DomainCreate) -> Domain | None:
+    """
+    Yeni domain ekler ve ilk SSL kontrolünü yapar. Domain zaten kayıtlıysa None döner.
+    Varlık kontrolü ve ekleme tek sorguda yapılır (INSERT ... ON CONFLICT DO NOTHING RETURNING).
+    """
+    stmt = (
+        sqlite_insert(Domain)
+        .values(domain=data.domain.strip().lower(), notes=data.notes)
+        .on_conflict_do_nothing(index_elements=["domain"])
+        .returning(Domain)
+    )
+    domain = (await db.scalars(stmt)).one_or_none()
+    if domain is None:
+        return None
+    info = await _fetch_ssl_info(domain.domain)
     _apply_ssl_info(domain, info)
     await db.flush()
-    await db.refresh(domain)
     return domain
 
 
 def _apply_ssl_info(domain: Domain, info: SSLInfo) -> None:
-    domain.last_checked_at = datetime.now(timezone.utc)
+    domain.last_checked_at = info.checked_at or datetime.now(timezone.utc)
     domain.expires_at = info.expires_at
     domain.issuer = info.issuer
     domain.days_until_expiry = info.days_until_expiry
@@ -57,7 +85,6 @@ async def update_domain(db: AsyncSession, domain: Domain, data: DomainUpdate) ->
     if data.notes is not None:
         domain.notes = data.notes
     await db.flush()
-    await db.refresh(domain)
     return domain
 
 
@@ -68,19 +95,36 @@ async def delete_domain(db: AsyncSession, domain: Domain) -> None:
 
 
 async def refresh_ssl(db: AsyncSession, domain: Domain) -> Domain:
-    """Domain için SSL bilgisini yeniler."""
-    info = get_ssl_info(domain.domain)
+    """Domain için SSL bilgisini yeniler. Açık yenileme olduğundan önbellek atlanır."""
+    invalidate_ssl_cache(domain.domain)
+    info = await _fetch_ssl_info(domain.domain)
     _apply_ssl_info(domain, info)
     await db.flush()
-    await db.refresh(domain)
     return domain
 
 
-async def refresh_all_ssl(db: AsyncSession) -> int:
-    """Tüm domainlerin SSL bilgisini yeniler."""
+async def refresh_all_ssl(db: AsyncSession, use_cache: bool = True) -> int:
+    """
+    Tüm domainlerin SSL bilgisini yeniler.
+    Kontroller eşzamanlı yapılır (en fazla SSL_CHECK_CONCURRENCY), sonuçlar tek flush ile yazılır.
+    use_cache=False: kullanıcının açık yenilemesi; önbellek temizlenir, tüm domainler yeniden yoklanır.
+    """
+    if not use_cache:
+        invalidate_ssl_cache()
     domains = await get_domains(db)
-    for d in domains:
-        info = get_ssl_info(d.domain)
+    # Önce tüm DNS sorguları birlikte (aynı zaman aşımıyla); çözülemeyen domainler için handshake denenmez
+    resolved = await asyncio.gather(
+        *[asyncio.wait_for(resolve_host(d.domain), SSL_CHECK_TIMEOUT_SECONDS) for d in domains],
+        return_exceptions=True,
+    )
+    # Handshake'ler eşzamanlı yapılır; DB'ye tek geçişte yazılır
+    infos = await asyncio.gather(
+        *[_fetch_ssl_info(d.domain, addrs) for d, addrs in zip(domains, resolved)],
+        return_exceptions=True,
+    )
+    for d, info in zip(domains, infos):
+        if isinstance(info, BaseException):
+            info = SSLInfo(None, None, None, False, str(info))
         _apply_ssl_info(d, info)
     await db.flush()
     return len(domains)
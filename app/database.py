@@ -1,7 +1,8 @@
 """Veritabanı bağlantısı ve session yönetimi."""
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
-from app.config import DB_PATH
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.config import DB_MAX_OVERFLOW, DB_PATH, DB_POOL_SIZE
 
 DATABASE_URL = f"sqlite+aiosqlite:///{DB_PATH}"
 
@@ -9,6 +10,10 @@ engine = create_async_engine(
     DATABASE_URL,
     echo=False,
     connect_args={"check_same_thread": False},
+    # Yerel SQLite dosyası: sunucu tarafında düşen bağlantı olmadığından pre_ping/recycle gerekmez
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
 )
 
 AsyncSessionLocal = async_sessionmaker(
@@ -36,6 +41,20 @@ async def get_db():
             await session.close()
 
 
+async def get_conn():
+    """Salt okunur tekil sorgular için ORM session'ı (identity map, flush) kurmadan bağlantı verir."""
+    async with engine.connect() as conn:
+        yield conn
+
+
+def _create_missing_indexes(sync_conn) -> None:
+    """create_all mevcut tablolara sonradan eklenen index'leri oluşturmaz; eksikleri burada açılır."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(sync_conn, checkfirst=True)
+
+
 async def init_db():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_create_missing_indexes)
@@ -1,11 +1,9 @@
 """FastAPI uygulaması."""
 from contextlib import asynccontextmanager
-from pathlib import Path
 import logging
 
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
 from app.config import (
@@ -21,9 +19,8 @@ from app import models  # noqa: F401 - register models before init_db
 from app.crud import get_domains_expiring_within_days, refresh_all_ssl
 from app.mailer import send_ssl_alert_email
 from app.routers import domains
+from app.templating import TEMPLATES_DIR, templates  # noqa: F401
 
-TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
 logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s %(levelname)s %(name)s: %(message)s",
@@ -61,7 +58,6 @@ async def scheduled_ssl_expiry_alert():
 async def lifespan(app: FastAPI):
     """Uygulama başlangıç/bitiş."""
     await init_db()
-    app.state.templates = templates
     scheduler = AsyncIOScheduler(timezone=APP_TIMEZONE)
     scheduler.add_job(scheduled_ssl_refresh, "interval", minutes=SSL_CHECK_INTERVAL_MINUTES)
     scheduler.add_job(
@@ -89,4 +85,4 @@ async def health():
 
 
 def get_templates(request: Request):
-    return request.app.state.templates
+    return templates
@@ -1,18 +1,49 @@
 """Veritabanı modelleri."""
-from datetime import datetime
-from sqlalchemy import String, Integer, DateTime, Text, Boolean
+from datetime import datetime, timezone
+from sqlalchemy import String, Integer, DateTime, Text, Boolean, Index, case, func
+from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy.types import TypeDecorator
 from app.database import Base
 
 
+class UTCDateTime(TypeDecorator):
+    """
+    SQLite saat dilimi saklamaz (DateTime(timezone=True) orada etkisizdir): değerler UTC'ye çevrilip
+    yazılır, okunurken UTC eklenir. Böylece yeni yazılan ve DB'den okunan değerler aynı biçimde serileşir.
+    """
+
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is not None and value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value, dialect):
+        if value is not None and value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value
+
+
 class Domain(Base):
     __tablename__ = "domains"
+    __table_args__ = (
+        # Süreye göre filtreleyip domain sırasıyla okuyan sorgular sort adımı olmadan index'ten okunur
+        Index("ix_domains_expiry_domain", "days_until_expiry", "domain"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     domain: Mapped[str] = mapped_column(String(253), unique=True, nullable=False, index=True)
-    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
-    last_checked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
-    expires_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # server_default yeni şemalar içindir; mevcut SQLite tablolarında DEFAULT olmadığından ORM varsayılanı da kalır
+    created_at: Mapped[datetime] = mapped_column(
+        UTCDateTime(),
+        default=lambda: datetime.now(timezone.utc),
+        server_default=func.now(),
+    )
+    last_checked_at: Mapped[datetime | None] = mapped_column(UTCDateTime(), nullable=True)
+    expires_at: Mapped[datetime | None] = mapped_column(UTCDateTime(), nullable=True)
     issuer: Mapped[str | None] = mapped_column(String(512), nullable=True)
     days_until_expiry: Mapped[int | None] = mapped_column(Integer, nullable=True)
     ssl_valid: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -22,8 +53,9 @@ class Domain(Base):
     chain_path: Mapped[str | None] = mapped_column(String(512), nullable=True)
     notes: Mapped[str | None] = mapped_column(Text, nullable=True)
 
+    @hybrid_property
     def status(self) -> str:
-        """Durum: ok, warning, critical, expired, unknown."""
+        """Durum: ok, warning, critical, expired, unknown. SQL'de de kullanılabilir (Domain.status == "expired")."""
         if self.days_until_expiry is None:
             return "unknown"
         if self.days_until_expiry < 0:
@@ -33,3 +65,13 @@ class Domain(Base):
         if self.days_until_expiry <= 30:
             return "warning"
         return "ok"
+
+    @status.expression
+    def status(cls):
+        return case(
+            (cls.days_until_expiry.is_(None), "unknown"),
+            (cls.days_until_expiry < 0, "expired"),
+            (cls.days_until_expiry <= 7, "critical"),
+            (cls.days_until_expiry <= 30, "warning"),
+            else_="ok",
+        )
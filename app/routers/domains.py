@@ -1,22 +1,33 @@
 """Domain API ve sayfa route'ları."""
+import asyncio
+import functools
+import io
+import os
+import stat
+import uuid
+import zipfile
+from collections import OrderedDict
+from email.utils import formatdate
+from pathlib import Path
 from urllib.parse import quote
 
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, Response
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Form
+from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse, Response
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
 
 from app.crud import (
     create_domain,
     delete_domain,
     get_domain_by_id,
-    get_domain_by_name,
+    get_domain_name,
     get_domains,
+    list_domains_projected,
     refresh_all_ssl,
     refresh_ssl,
     update_domain,
 )
-from app.database import get_db
-from app.schemas import DomainCreate, DomainResponse, DomainUpdate
+from app.database import AsyncSessionLocal, get_conn, get_db
+from app.schemas import DOMAIN_LIST_ADAPTER, DomainCreate, DomainResponse, DomainUpdate
 from app.config import AUTO_DOWNLOAD_CHALLENGE, CERTBOT_EMAIL, CERTBOT_WEBROOT
 from app.certbot_runner import (
     run_certbot,
@@ -29,9 +40,18 @@ from app.certbot_runner import (
     read_ca_bundle_bytes,
 )
 from app.mailer import send_test_email
+from app.templating import templates
 
 router = APIRouter(prefix="", tags=["domains"])
 
+def _index_url(request: Request) -> str:
+    """
+    Ana sayfa adresi. Yönlendirmelerde url_for ile route tablosu taranmaz;
+    uygulama bir önek altında (root_path) yayınlanıyorsa o korunur.
+    """
+    return request.scope.get("root_path", "") + "/"
+
+
 def _template_url_for(request: Request):
     def url_for(name: str, **path_params):
         return str(request.url_for(name, **path_params))
@@ -52,6 +72,8 @@ async def index(request: Request, db: AsyncSession = Depends(get_db)):
     pending = request.query_params.get("pending") == "1"
     completing = request.query_params.get("completing") == "1"
     renew_success = request.query_params.get("renew_success") == "1"
+    refresh_job = request.query_params.get("refresh_job")
+    refresh_status = _refresh_jobs.get(refresh_job) if refresh_job else None
     challenge_domain = challenge_file_name = challenge_file_content = None
     challenge_domains = None
     if challenge_job:
@@ -63,11 +85,10 @@ async def index(request: Request, db: AsyncSession = Depends(get_db)):
             challenge_file_content = status.get("file_content")
         elif not pending and not completing:
             challenge_domain, challenge_file_name, challenge_file_content = get_pending_http_file(challenge_job)
-    tmpl = request.app.state.templates
-    return tmpl.TemplateResponse(
+    return templates.TemplateResponse(
+        request,
         "index.html",
         {
-            "request": request,
             "url_for": _template_url_for(request),
             "domains": domains,
             "error": error,
@@ -75,6 +96,8 @@ async def index(request: Request, db: AsyncSession = Depends(get_db)):
             "test_email": test_email,
             "test_email_error": test_email_error,
             "challenge_job": challenge_job,
+            "refresh_job": refresh_job if refresh_status else None,
+            "refresh_status": refresh_status,
             "challenge_domain_id": int(domain_id) if domain_id and domain_id.isdigit() else None,
             "challenge_domain": challenge_domain,
             "challenge_domains": challenge_domains,
@@ -91,7 +114,7 @@ async def index(request: Request, db: AsyncSession = Depends(get_db)):
 @router.post("/alerts/send-test", response_class=RedirectResponse)
 async def send_test_alert_email(request: Request):
     """SMTP test e-postasi gonderir."""
-    url = str(request.url_for("index"))
+    url = _index_url(request)
     try:
         sent = await send_test_email()
         if not sent:
@@ -111,17 +134,16 @@ async def add_domain(
     domain = (domain or "").strip().lower()
     if not domain:
         return RedirectResponse(
-            url=str(request.url_for("index")) + "?error=domain_empty",
+            url=_index_url(request) + "?error=domain_empty",
             status_code=303,
         )
-    existing = await get_domain_by_name(db, domain)
-    if existing:
+    created = await create_domain(db, DomainCreate(domain=domain, notes=None))
+    if created is None:
         return RedirectResponse(
-            url=str(request.url_for("index")) + "?error=domain_exists",
+            url=_index_url(request) + "?error=domain_exists",
             status_code=303,
         )
-    await create_domain(db, DomainCreate(domain=domain, notes=None))
-    return RedirectResponse(url=request.url_for("index"), status_code=303)
+    return RedirectResponse(url=_index_url(request), status_code=303)
 
 
 @router.post("/domains/{domain_id}/delete", response_class=RedirectResponse)
@@ -135,14 +157,54 @@ async def remove_domain(
     if not d:
         raise HTTPException(status_code=404, detail="Domain bulunamadı")
     await delete_domain(db, d)
-    return RedirectResponse(url=request.url_for("index"), status_code=303)
+    return RedirectResponse(url=_index_url(request), status_code=303)
+
+
+# Toplu SSL yenileme işleri: job_id -> {status: running | done | error, count, error}; en yeni 32 iş tutulur
+_refresh_jobs: OrderedDict[str, dict] = OrderedDict()
+_REFRESH_JOBS_MAX = 32
+
+
+async def _refresh_all_job(job: dict) -> None:
+    """Tüm domainleri istekten bağımsız, kendi session'ında yeniler; sonucu iş kaydına yazar."""
+    try:
+        async with AsyncSessionLocal() as db:
+            job["count"] = await refresh_all_ssl(db, use_cache=False)
+            await db.commit()
+        job["status"] = "done"
+    except Exception as e:
+        job["status"] = "error"
+        job["error"] = str(e)
+
+
+def _start_refresh_all_job(background_tasks: BackgroundTasks) -> str:
+    """Yeni toplu yenileme işi başlatır; zaten çalışan varsa onun ID'sini döner (tekrar tıklamalar yük bindirmez)."""
+    for job_id, job in _refresh_jobs.items():
+        if job["status"] == "running":
+            return job_id
+    job_id = str(uuid.uuid4())
+    job = {"status": "running", "count": None, "error": None}
+    _refresh_jobs[job_id] = job
+    while len(_refresh_jobs) > _REFRESH_JOBS_MAX:
+        _refresh_jobs.popitem(last=False)
+    background_tasks.add_task(_refresh_all_job, job)
+    return job_id
 
 
 @router.post("/domains/refresh-all", response_class=RedirectResponse)
-async def refresh_all_domain_ssl(request: Request, db: AsyncSession = Depends(get_db)):
-    """Tüm domainlerin SSL bilgisini yeniler."""
-    await refresh_all_ssl(db)
-    return RedirectResponse(url=request.url_for("index"), status_code=303)
+async def refresh_all_domain_ssl(request: Request, background_tasks: BackgroundTasks):
+    """Tüm domainlerin SSL bilgisini arka planda yeniler; sayfa hemen döner ve iş durumunu yoklar."""
+    job_id = _start_refresh_all_job(background_tasks)
+    return RedirectResponse(url=_index_url(request) + f"?refresh_job={job_id}", status_code=303)
+
+
+@router.get("/api/refresh-jobs/{job_id}/status")
+async def refresh_job_status(job_id: str):
+    """Toplu SSL yenileme işinin durumunu döndürür."""
+    job = _refresh_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="İş bulunamadı")
+    return job
 
 
 @router.post("/domains/{domain_id}/refresh", response_class=RedirectResponse)
@@ -160,7 +222,7 @@ async def refresh_domain_ssl(
         email=CERTBOT_EMAIL,
         domain_id=domain_id,
     )
-    url = str(request.url_for("index"))
+    url = _index_url(request)
     if err or not job_id:
         return RedirectResponse(url=url + "?certbot_error=" + quote((err[:400] if err else "İş başlatılamadı")), status_code=303)
     return RedirectResponse(
@@ -181,7 +243,7 @@ async def refresh_challenge_continue(
     if not d:
         raise HTTPException(status_code=404, detail="Domain bulunamadı")
     started, err = await start_continue_certbot_http(job_id, domain_id)
-    url = str(request.url_for("index"))
+    url = _index_url(request)
     if not started:
         return RedirectResponse(url=url + "?certbot_error=" + quote((err[:400] if err else "İş başlatılamadı")), status_code=303)
     return RedirectResponse(
@@ -216,19 +278,21 @@ async def download_challenge_file(job_id: str):
     )
 
 
-@router.get("/api/domains", response_model=list[DomainResponse])
+@router.get("/api/domains", responses={200: {"model": list[DomainResponse]}})
 async def api_list_domains(db: AsyncSession = Depends(get_db)):
     """API: Tüm domainleri listeler."""
-    return await get_domains(db)
+    rows = await list_domains_projected(db)
+    domains = DOMAIN_LIST_ADAPTER.validate_python(rows, from_attributes=True)
+    return Response(content=DOMAIN_LIST_ADAPTER.dump_json(domains), media_type="application/json")
 
 
 @router.post("/api/domains", response_model=DomainResponse)
 async def api_create_domain(data: DomainCreate, db: AsyncSession = Depends(get_db)):
     """API: Yeni domain ekler."""
-    existing = await get_domain_by_name(db, data.domain)
-    if existing:
+    created = await create_domain(db, data)
+    if created is None:
         raise HTTPException(status_code=400, detail="Bu domain zaten kayıtlı")
-    return await create_domain(db, data)
+    return created
 
 
 @router.get("/api/domains/{domain_id}", response_model=DomainResponse)
@@ -261,16 +325,69 @@ async def api_refresh_ssl(domain_id: int, db: AsyncSession = Depends(get_db)):
     return await refresh_ssl(db, d)
 
 
-def _download_response(content: bytes | None, filename: str, media_type: str = "application/x-pem-file") -> Response:
+@functools.lru_cache(maxsize=1024)
+def _download_basename(domain: str) -> str:
+    """İndirme dosya adlarının ortak kökü (example.com -> example_com); domain başına bir kez hesaplanır."""
+    return domain.replace(".", "_")
+
+
+def _download_response(
+    content: bytes | None,
+    filename: str,
+    media_type: str = "application/x-pem-file",
+    cache_control: str | None = None,
+) -> Response:
     """İndirme yanıtı oluşturur."""
     if content is None:
         raise HTTPException(status_code=404, detail="Dosya bulunamadı veya okunamadı")
-    return Response(
-        content=content,
-        media_type=media_type,
-        headers={
-            "Content-Disposition": f'attachment; filename="{filename}"',
-        },
+    headers = {"Content-Disposition": f'attachment; filename="{filename}"'}
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    """If-None-Match başlığı verilen ETag'i (veya *) içeriyor mu."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or "*" in tags
+
+
+def _file_download_response(
+    request: Request,
+    path: str,
+    filename: str,
+    cache_control: str = "no-cache",
+) -> Response:
+    """
+    Diskteki dosyayı FileResponse ile indirir (Linux'ta sendfile; içerik Python belleğine okunmaz).
+    Sembolik linkler çözülür; dosya yoksa 404, okuma izni yoksa 403.
+    ETag tek stat'tan (mtime + boyut) üretilir; istemcideki kopya güncelse gövdesiz 304 döner.
+    """
+    resolved = Path(path).resolve(strict=False)
+    try:
+        st = resolved.stat()
+    except OSError:
+        st = None
+    if st is None or not stat.S_ISREG(st.st_mode):
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı veya okunamadı")
+    if not os.access(resolved, os.R_OK):
+        raise HTTPException(status_code=403, detail="İzin yok: dosya okunamıyor")
+    headers = {
+        "Cache-Control": cache_control,
+        "ETag": f'"{st.st_mtime_ns:x}-{st.st_size:x}"',
+        "Last-Modified": formatdate(st.st_mtime, usegmt=True),
+    }
+    if _etag_matches(request, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        resolved,
+        filename=filename,
+        media_type="application/x-pem-file",
+        headers=headers,
+        stat_result=st,
     )
 
 
@@ -282,56 +399,103 @@ def _raise_cert_error(result, default_detail: str):
 
 
 @router.get("/api/domains/{domain_id}/download/cert")
-async def download_cert(domain_id: int, db: AsyncSession = Depends(get_db)):
+async def download_cert(request: Request, domain_id: int, conn: AsyncConnection = Depends(get_conn)):
     """Sertifika (cert.pem) indirir — .crt olarak sunar."""
-    d = await get_domain_by_id(db, domain_id)
-    if not d:
+    name = await get_domain_name(conn, domain_id)
+    if not name:
         raise HTTPException(status_code=404, detail="Domain bulunamadı")
-    result = get_cert_paths(d.domain)
+    result = get_cert_paths(name)
     if not result.success or not result.cert_path:
         _raise_cert_error(result, "Sertifika dosyası yok")
-    content = read_cert_file(result.cert_path)
-    filename = d.domain.replace(".", "_") + ".crt"
-    return _download_response(content, filename)
+    filename = _download_basename(name) + ".crt"
+    return _file_download_response(request, result.cert_path, filename)
 
 
 @router.get("/api/domains/{domain_id}/download/fullchain")
-async def download_fullchain(domain_id: int, db: AsyncSession = Depends(get_db)):
+async def download_fullchain(request: Request, domain_id: int, conn: AsyncConnection = Depends(get_conn)):
     """Fullchain (cert + chain) indirir — sunucuda tek crt olarak kullanılır."""
-    d = await get_domain_by_id(db, domain_id)
-    if not d:
+    name = await get_domain_name(conn, domain_id)
+    if not name:
         raise HTTPException(status_code=404, detail="Domain bulunamadı")
-    result = get_cert_paths(d.domain)
+    result = get_cert_paths(name)
     if not result.success or not result.fullchain_path:
         _raise_cert_error(result, "Fullchain dosyası yok")
-    content = read_cert_file(result.fullchain_path)
-    filename = d.domain.replace(".", "_") + "_fullchain.crt"
-    return _download_response(content, filename)
+    filename = _download_basename(name) + "_fullchain.crt"
+    return _file_download_response(request, result.fullchain_path, filename)
 
 
 @router.get("/api/domains/{domain_id}/download/chain")
-async def download_chain(domain_id: int, db: AsyncSession = Depends(get_db)):
+async def download_chain(domain_id: int, conn: AsyncConnection = Depends(get_conn)):
     """CA bundle (yalnızca ara sertifikalar) indirir."""
-    d = await get_domain_by_id(db, domain_id)
-    if not d:
+    name = await get_domain_name(conn, domain_id)
+    if not name:
         raise HTTPException(status_code=404, detail="Domain bulunamadı")
-    content = read_ca_bundle_bytes(d.domain)
+    content = await asyncio.to_thread(read_ca_bundle_bytes, name)
     if content is None:
-        result = get_cert_paths(d.domain)
+        result = get_cert_paths(name)
         _raise_cert_error(result, "CA bundle dosyası yok")
-    filename = d.domain.replace(".", "_") + "_cabundle.pem"
+    filename = _download_basename(name) + "_cabundle.pem"
     return _download_response(content, filename)
 
 
 @router.get("/api/domains/{domain_id}/download/key")
-async def download_key(domain_id: int, db: AsyncSession = Depends(get_db)):
+async def download_key(request: Request, domain_id: int, conn: AsyncConnection = Depends(get_conn)):
     """Private key (privkey.pem) indirir."""
-    d = await get_domain_by_id(db, domain_id)
-    if not d:
+    name = await get_domain_name(conn, domain_id)
+    if not name:
         raise HTTPException(status_code=404, detail="Domain bulunamadı")
-    result = get_cert_paths(d.domain)
+    result = get_cert_paths(name)
     if not result.success or not result.key_path:
         _raise_cert_error(result, "Private key dosyası yok")
-    content = read_cert_file(result.key_path)
-    filename = d.domain.replace(".", "_") + "_private.key"
-    return _download_response(content, filename)
+    filename = _download_basename(name) + "_private.key"
+    # Private key hiçbir ara önbellekte tutulmasın
+    return _file_download_response(request, result.key_path, filename, cache_control="no-store")
+
+
+async def _read_cert_file_async(path: str | None) -> bytes | None:
+    """read_cert_file'ı thread'de çalıştırır; yol yoksa None döner."""
+    if not path:
+        return None
+    return await asyncio.to_thread(read_cert_file, path)
+
+
+def _build_zip(files: list[tuple[str, bytes]]) -> bytes:
+    """Verilen (dosya adı, içerik) çiftlerini bellekte zip arşivine yazar."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, content in files:
+            zf.writestr(name, content)
+    return buf.getvalue()
+
+
+@router.get("/api/domains/{domain_id}/download/bundle")
+async def download_bundle(domain_id: int, conn: AsyncConnection = Depends(get_conn)):
+    """Sertifika, fullchain, CA bundle ve private key'i tek zip olarak indirir (tek sorgu, tek yol çözümü)."""
+    name = await get_domain_name(conn, domain_id)
+    if not name:
+        raise HTTPException(status_code=404, detail="Domain bulunamadı")
+    result = get_cert_paths(name)
+    if not result.success or not result.cert_path:
+        _raise_cert_error(result, "Sertifika dosyası yok")
+    base = _download_basename(name)
+    cert, fullchain, key, ca_bundle = await asyncio.gather(
+        _read_cert_file_async(result.cert_path),
+        _read_cert_file_async(result.fullchain_path),
+        _read_cert_file_async(result.key_path),
+        asyncio.to_thread(read_ca_bundle_bytes, name),
+    )
+    if cert is None:
+        raise HTTPException(status_code=404, detail="Dosya bulunamadı veya okunamadı")
+    files = [
+        (file_name, data)
+        for file_name, data in (
+            (base + ".crt", cert),
+            (base + "_fullchain.crt", fullchain),
+            (base + "_cabundle.pem", ca_bundle),
+            (base + "_private.key", key),
+        )
+        if data is not None
+    ]
+    content = await asyncio.to_thread(_build_zip, files)
+    # Arşiv private key içerir: tekil key indirmesi gibi hiçbir ara önbellekte tutulmasın
+    return _download_response(content, base + "_bundle.zip", media_type="application/zip", cache_control="no-store")
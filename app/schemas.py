@@ -1,6 +1,6 @@
 """Pydantic şemaları."""
 from datetime import datetime
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 
 class DomainCreate(BaseModel):
@@ -31,6 +31,10 @@ class DomainResponse(BaseModel):
         from_attributes = True
 
 
+# Domain listesi tek seferde doğrulanıp JSON'a çevrilir (öğe başına ayrı model dönüşümü yok)
+DOMAIN_LIST_ADAPTER = TypeAdapter(list[DomainResponse])
+
+
 class CertPathsResponse(BaseModel):
     cert_path: str
     key_path: str
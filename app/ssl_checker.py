@@ -1,9 +1,17 @@
 """SSL sertifika süresi kontrolü."""
+import asyncio
+import contextlib
 import ssl
 import socket
+import time
 from datetime import datetime, timezone
 from typing import NamedTuple
 
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+
+from app.config import SSL_CACHE_TTL_SECONDS
+
 
 class SSLInfo(NamedTuple):
     expires_at: datetime | None
@@ -11,48 +19,115 @@ class SSLInfo(NamedTuple):
     days_until_expiry: int | None
     valid: bool
     error: str | None
+    # Handshake'in yapıldığı an; önbellekten dönen sonuçta ilk kontrolün zamanıdır
+    checked_at: datetime | None = None
+
+
+# CA deposu ve şifre listeleri bir kez yüklenir; SSLContext bağlantılar arasında paylaşılabilir
+_SSL_CTX = ssl.create_default_context()
+
+# Başarılı kontrol sonuçları: (domain, port) -> (zaman, SSLInfo)
+_ssl_cache: dict[tuple[str, int], tuple[float, SSLInfo]] = {}
 
 
-def get_ssl_info(domain: str, port: int = 443, timeout: float = 10.0) -> SSLInfo:
+def invalidate_ssl_cache(domain: str | None = None) -> None:
+    """Domainin (verilmezse tüm domainlerin) önbellekteki SSL sonucunu siler."""
+    if domain is None:
+        _ssl_cache.clear()
+        return
+    for key in [k for k in _ssl_cache if k[0] == domain]:
+        _ssl_cache.pop(key, None)
+
+
+def _parse_der_cert(der: bytes | None) -> SSLInfo:
+    """DER sertifikadan SSLInfo üretir; bitiş tarihi ve issuer doğrudan x509 nesnesinden okunur."""
+    if not der:
+        return SSLInfo(None, None, None, False, "Sertifika alınamadı")
+    cert = x509.load_der_x509_certificate(der)
+    expires_at = cert.not_valid_after_utc
+    days = (expires_at - datetime.now(timezone.utc)).days
+    issuer = next((a.value for a in cert.issuer.get_attributes_for_oid(NameOID.ORGANIZATION_NAME)), None)
+    return SSLInfo(expires_at=expires_at, issuer=issuer or None, days_until_expiry=days, valid=True, error=None)
+
+
+async def resolve_host(domain: str, port: int = 443) -> list[tuple[str, int]]:
+    """
+    Domainin tüm (ip, port) adreslerini getaddrinfo sırasıyla döndürür.
+    Toplu kontrollerde tüm DNS sorguları önceden, birlikte yapılır.
+    """
+    infos = await asyncio.get_running_loop().getaddrinfo(domain, port, type=socket.SOCK_STREAM)
+    return list(dict.fromkeys(info[4][:2] for info in infos))
+
+
+async def _open_tls(domain: str, addrs: list[tuple[str, int]]):
+    """
+    Adresleri sırayla dener (open_connection(host) gibi): ölü bir ilk adres (ör. bozuk IPv6) kontrolü düşürmez.
+    TLS/sertifika hataları adres sorunu olmadığından beklenmeden yükseltilir.
+    """
+    last_exc: OSError | None = None
+    for host, port in addrs:
+        try:
+            return await asyncio.open_connection(host, port, ssl=_SSL_CTX, server_hostname=domain)
+        except ssl.SSLError:
+            raise
+        except OSError as e:
+            last_exc = e
+    raise last_exc
+
+
+async def get_ssl_info(
+    domain: str,
+    port: int = 443,
+    timeout: float = 10.0,
+    addrs: list[tuple[str, int]] | BaseException | None = None,
+) -> SSLInfo:
     """
     Domain için SSL sertifika bilgisini alır.
+    Son SSL_CACHE_TTL_SECONDS içindeki başarılı sonuç varsa handshake yapılmadan döner.
+    addrs: resolve_host sonucu; verilirse DNS atlanır (SNI ve doğrulama yine domain ile yapılır).
+    Çözümleme hatası verilirse handshake denenmeden hata olarak döner.
     """
-    context = ssl.create_default_context()
+    key = (domain, port)
+    hit = _ssl_cache.get(key)
+    if hit and time.monotonic() - hit[0] < SSL_CACHE_TTL_SECONDS:
+        return hit[1]
+    info = (await _probe_ssl_info(domain, port, timeout, addrs))._replace(checked_at=datetime.now(timezone.utc))
+    # Hatalar önbelleğe alınmaz: geçici sorunlar bir sonraki kontrolde yeniden denenir
+    if info.valid and SSL_CACHE_TTL_SECONDS > 0:
+        _ssl_cache[key] = (time.monotonic(), info)
+    return info
+
+
+async def _probe_ssl_info(
+    domain: str,
+    port: int,
+    timeout: float,
+    addrs: list[tuple[str, int]] | BaseException | None = None,
+) -> SSLInfo:
+    """Bağlantı ve handshake event loop üzerinde yapılır; çağıranı bloklamaz."""
     try:
-        with socket.create_connection((domain, port), timeout=timeout) as sock:
-            with context.wrap_socket(sock, server_hostname=domain) as ssock:
-                cert = ssock.getpeercert()
-                if not cert:
-                    return SSLInfo(None, None, None, False, "Sertifika alınamadı")
-                # 'notAfter' format: 'Feb 26 12:00:00 2026 GMT'
-                not_after = cert.get("notAfter")
-                if not not_after:
-                    return SSLInfo(None, None, None, False, "notAfter yok")
-                expires_at = datetime.strptime(not_after, "%b %d %H:%M:%S %Y %Z").replace(tzinfo=timezone.utc)
-                now = datetime.now(timezone.utc)
-                delta = expires_at - now
-                days = delta.days
-                issuer = ""
-                if "issuer" in cert:
-                    iss = cert["issuer"]
-                    if isinstance(iss, tuple):
-                        for item in iss:
-                            if isinstance(item, tuple):
-                                for (k, v) in item:
-                                    if k == "organizationName":
-                                        issuer = v
-                                        break
-                    if not issuer and isinstance(iss, list):
-                        for item in iss:
-                            if isinstance(item, dict) and "organizationName" in item:
-                                issuer = item["organizationName"]
-                                break
-                return SSLInfo(expires_at=expires_at, issuer=issuer or None, days_until_expiry=days, valid=True, error=None)
+        if isinstance(addrs, BaseException):
+            raise addrs
+        if addrs:
+            connect = _open_tls(domain, addrs)
+        else:
+            connect = asyncio.open_connection(domain, port, ssl=_SSL_CTX, server_hostname=domain)
+        _, writer = await asyncio.wait_for(connect, timeout)
+        try:
+            ssl_object = writer.get_extra_info("ssl_object")
+            der = ssl_object.getpeercert(binary_form=True) if ssl_object else None
+        finally:
+            writer.close()
+            # TLS kapanışı tamamlanır; kapanış hatası sertifika sonucunun yerine geçmez
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+        return _parse_der_cert(der)
     except ssl.SSLCertVerificationError as e:
         return SSLInfo(None, None, None, False, str(e))
     except socket.gaierror as e:
         return SSLInfo(None, None, None, False, f"DNS/bağlantı: {e}")
-    except (socket.timeout, TimeoutError) as e:
-        return SSLInfo(None, None, None, False, f"Zaman aşımı: {e}")
+    except (socket.timeout, TimeoutError, asyncio.TimeoutError):
+        # asyncio.TimeoutError'ın mesajı boştur; süre açıkça yazılır
+        return SSLInfo(None, None, None, False, f"Zaman aşımı ({timeout:g} sn)")
     except Exception as e:
         return SSLInfo(None, None, None, False, str(e))
@@ -0,0 +1,20 @@
+"""Jinja2 şablon motoru."""
+from pathlib import Path
+
+import jinja2
+from fastapi.templating import Jinja2Templates
+
+from app.config import DATA_DIR
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+# Derlenmiş şablonlar diske yazılır; yeniden başlatmada Jinja kaynağı tekrar derlemez
+TEMPLATES_CACHE_DIR = DATA_DIR / "jinja_cache"
+TEMPLATES_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+
+templates = Jinja2Templates(
+    env=jinja2.Environment(
+        loader=jinja2.FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=jinja2.select_autoescape(),
+        bytecode_cache=jinja2.FileSystemBytecodeCache(str(TEMPLATES_CACHE_DIR)),
+    )
+)